@@ -1,6 +1,9 @@
 import robin_stocks as r # robinhood API
 import pyotp # library to handle MFA
 from datetime import datetime 
+import io
+import os
+import csv
 import credentials
 
 # Gets holding information from configured RobinHood account
@@ -8,13 +11,13 @@ import credentials
 
 # If your account is configured with MFA
 # set mfa=True on function invocation
+# and export the authenticator secret as MFA_SECRET
 def authenticate(mfa=False):
     user = credentials.USERNAME
     passw = credentials.PASSWORD
 
     if mfa == True:
-        mfa_code = input("Enter your MFA code:")
-        totp = pyotp.TOTP(mfa_code).now()
+        totp = pyotp.TOTP(os.getenv("MFA_SECRET")).now()
         result = r.login(user,passw , mfa_code=totp) # Login
     else:
         result = r.login(user,passw) # Login
@@ -22,31 +25,30 @@ def authenticate(mfa=False):
 
 def generate_holdings_csv():
 
-    with open("./my_stocks.csv", "w") as my_stocks_csv: # Open CSV file
-        my_stocks_csv.write("Ticker Name,Price,Quantity,Average_Buy_Price,Equity,Equity_Change,Average_Buy_Price\n") # For OpenOffice
-
     my_stocks = r.build_holdings() # Get Stock Data
-    stock_info_line = ""
 
     my_stock_tickers = [] # Buffer Variables
+    stock_rows = []
     total_equity_change = 0 
 
     # Go through every stock element
-    # and construct the line to be written to csv
+    # and construct the row to be written to csv
     for key,val in my_stocks.items():
         my_stock_tickers.append(key)
         stock_name_val = val["name"]
         stock_name_val = stock_name_val.replace(" ","_" )
+        equity_change = val["equity_change"]
 
-        total_equity_change += float(val["equity_change"]) # calculates running total for the day
-        
-        # For OpenOffice
-        stock_info_line = key + " " + stock_name_val + " " + val["price"] + " " + val["quantity"] + " " + val["average_buy_price"] + " " + val["equity"] + " " + val["equity_change"] + " " + val["average_buy_price"] + "\n"    # For Microsoft Excel
-        #stock_info_line = key + "," + val["name"] + "," + val["price"] + "," + val["quantity"] + val["average_buy_price"] + "," + val["equity"] + "," + val["equity_change"] + "," + val["average_buy_price"] + "\n"
+        total_equity_change += float(equity_change) # calculates running total for the day
         
-        with open("./my_stocks.csv", "a") as my_stocks_csv:
-            my_stocks_csv.write(stock_info_line)
-            print(stock_info_line)
+        stock_row = (key, stock_name_val, val["price"], val["quantity"], val["average_buy_price"], val["equity"], equity_change)
+        stock_rows.append(stock_row)
+        print(*stock_row)
+
+    # Write the whole CSV at once instead of reopening it per holding
+    with io.open("./my_stocks.csv", "w", buffering=1 << 16, newline="") as my_stocks_csv:
+        my_stocks_csv.write("Ticker Name,Price,Quantity,Average_Buy_Price,Equity,Equity_Change\n") # For OpenOffice
+        csv.writer(my_stocks_csv, delimiter=" ", lineterminator="\n").writerows(stock_rows) # For Microsoft Excel, drop delimiter=" "
 
     #print(robin_bot.stocks.find_instrument_data("STPK"))
     #print(my_stock_tickers)
@@ -58,10 +60,19 @@ def calculate_holdings():
     allTransactions = r.get_bank_transfers()
     cardTransactions= r.get_card_transactions()
     #Calculate total holdings
-    deposits = sum(float(x['amount']) for x in allTransactions if (x['direction'] == 'deposit') and (x['state'] == 'completed'))
-    withdrawals = sum(float(x['amount']) for x in allTransactions if (x['direction'] == 'withdraw') and (x['state'] == 'completed'))
-    debits = sum(float(x['amount']['amount']) for x in cardTransactions if (x['direction'] == 'debit' and (x['transaction_type'] == 'settled')))
-    reversal_fees = sum(float(x['fees']) for x in allTransactions if (x['direction'] == 'deposit') and (x['state'] == 'reversed'))
+    deposits = withdrawals = debits = reversal_fees = 0.0
+    for x in allTransactions: # single pass over the bank transfers
+        direction, state = x['direction'], x['state']
+        if direction == 'deposit':
+            if state == 'completed':
+                deposits += float(x['amount'])
+            elif state == 'reversed':
+                reversal_fees += float(x['fees'])
+        elif direction == 'withdraw' and state == 'completed':
+            withdrawals += float(x['amount'])
+    for x in cardTransactions:
+        if x['direction'] == 'debit' and x['transaction_type'] == 'settled':
+            debits += float(x['amount']['amount'])
 
     money_invested = deposits + reversal_fees - (withdrawals - debits)
     dividends = r.get_total_dividends()
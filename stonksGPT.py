@@ -1,8 +1,7 @@
 import os
-import time
 import asyncio
 import logging
-from datetime import datetime
+from functools import partial
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import (
     Application,
@@ -15,18 +14,13 @@ from telegram.ext import (
 )
 from telegram.error import BadRequest
 from dotenv import load_dotenv
-from gpt_actions_kimi import (
-    escape_markdown_v2,
-    get_stock_ticker,
+from gpt_actions import (
     gpt_stock_analysis,
     bullish_check_gpt
 )
 from xstonks import (
-    generate_historical_dataframes,
-    golden_cross_detector,
     analyze_top_movers,
-    bullish_stock_check_data,
-    login_to_robinhood
+    ensure_logged_in
 )
 
 # Load environment variables
@@ -53,6 +47,21 @@ FEATURE_DISPLAY_NAMES = {
     CALLBACK_TOP_MOVERS: "Analyze Top Movers",
 }
 
+# Company prompt shown after a feature is selected
+FEATURE_PROMPT_CAPTIONS = {
+    feature: f"Please enter a company name or ticker symbol for {display_name}:"
+    for feature, display_name in FEATURE_DISPLAY_NAMES.items()
+}
+
+# Shown when the Robinhood session can't be (re)established
+LOGIN_FAILED_MESSAGE = "Could not log into Robinhood. Please try again later."
+
+# Labels for boolean indicator flags in the top movers report
+YES_NO = {True: "Yes", False: "No"}
+
+# Two-decimal formatter for prices and indicator values
+_F2 = "{:.2f}".format
+
 # Main menu keyboard
 main_menu_keyboard = [
     [InlineKeyboardButton(FEATURE_DISPLAY_NAMES[CALLBACK_ONE_YEAR_ANALYSIS], callback_data=CALLBACK_ONE_YEAR_ANALYSIS)],
@@ -65,19 +74,35 @@ main_menu_markup = InlineKeyboardMarkup(main_menu_keyboard)
 start_screen_keyboard = [[InlineKeyboardButton('🚀 Start', callback_data=CALLBACK_START_MENU)]]
 start_screen_markup = InlineKeyboardMarkup(start_screen_keyboard)
 
+# Static menu media, built once and reused for every message
+MENU_PHOTO_URL = "https://imgur.com/a/EixnwPs"
+MAIN_MENU_CAPTION = "Select an action:"
+START_SCREEN_CAPTION = (
+    "Welcome to StonksGPT! This bot provides financial analysis using GPT-4 and financial data.\n\n"
+    "[GitHub Page](https://github.com/your_username/stonksGPT)"
+)
+MAIN_MENU_MEDIA = InputMediaPhoto(media=MENU_PHOTO_URL, caption=MAIN_MENU_CAPTION)
+
+def menu_photo(context: ContextTypes.DEFAULT_TYPE) -> str:
+    """Return Telegram's file_id for the menu photo once known, so it isn't fetched from the URL again."""
+    return context.bot_data.get('menu_file_id', MENU_PHOTO_URL)
+
+def remember_menu_photo(context: ContextTypes.DEFAULT_TYPE, message) -> None:
+    """Cache the file_id of a sent menu photo in bot_data."""
+    if 'menu_file_id' not in context.bot_data and message.photo:
+        context.bot_data['menu_file_id'] = message.photo[-1].file_id
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Send the start message with a photo and start button."""
     chat_id = update.effective_chat.id
     logger.info(f"Starting bot for chat_id: {chat_id}")
-    await context.bot.send_photo(
+    sent = await context.bot.send_photo(
         chat_id,
-        photo="https://imgur.com/a/EixnwPs",
-        caption=(
-            "Welcome to StonksGPT! This bot provides financial analysis using GPT-4 and financial data.\n\n"
-            "[GitHub Page](https://github.com/your_username/stonksGPT)"
-        ),
+        photo=menu_photo(context),
+        caption=START_SCREEN_CAPTION,
         reply_markup=start_screen_markup
     )
+    remember_menu_photo(context, sent)
     return SELECTING_ACTION
 
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -86,7 +111,7 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await query.answer()
     logger.info("Showing main menu")
     await query.edit_message_media(
-        media=InputMediaPhoto(media="https://imgur.com/a/EixnwPs", caption="Select an action:"),
+        media=MAIN_MENU_MEDIA,
         reply_markup=main_menu_markup
     )
     return SELECTING_ACTION
@@ -94,12 +119,13 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def send_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send the main menu photo with options."""
     chat_id = update.effective_chat.id
-    await context.bot.send_photo(
+    sent = await context.bot.send_photo(
         chat_id,
-        photo="https://imgur.com/a/EixnwPs",
-        caption="Select an action:",
+        photo=menu_photo(context),
+        caption=MAIN_MENU_CAPTION,
         reply_markup=main_menu_markup
     )
+    remember_menu_photo(context, sent)
 
 async def handle_feature_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, feature: str) -> int:
     """Handle feature selection by prompting for company input."""
@@ -108,22 +134,12 @@ async def handle_feature_selection(update: Update, context: ContextTypes.DEFAULT
     display_name = FEATURE_DISPLAY_NAMES.get(feature, "Unknown Feature")
     logger.info(f"Handling feature selection: {feature} ({display_name})")
     await query.edit_message_caption(
-        caption=f"Please enter a company name or ticker symbol for {display_name}:",
+        caption=FEATURE_PROMPT_CAPTIONS.get(feature, "Please enter a company name or ticker symbol:"),
         reply_markup=None
     )
     context.user_data['selected_feature'] = feature
     return WAITING_FOR_COMPANY
 
-async def one_year_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Handle the '1 Year Stock Analysis' button click."""
-    logger.info("1 Year Stock Analysis button clicked")
-    return await handle_feature_selection(update, context, CALLBACK_ONE_YEAR_ANALYSIS)
-
-async def bullish_check(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Handle the 'Bullish Check' button click."""
-    logger.info("Bullish Check button clicked")
-    return await handle_feature_selection(update, context, CALLBACK_BULLISH_CHECK)
-
 async def analyze_top_movers_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the 'Analyze Top Movers' button click."""
     query = update.callback_query
@@ -131,6 +147,9 @@ async def analyze_top_movers_handler(update: Update, context: ContextTypes.DEFAU
     logger.info("Analyzing top movers")
     try:
         await query.edit_message_caption(caption="Analyzing top movers...")
+        if not await ensure_logged_in():
+            await query.edit_message_caption(caption=LOGIN_FAILED_MESSAGE)
+            return SELECTING_ACTION
         analysis_results = await analyze_top_movers()
         formatted_results = format_top_movers(analysis_results)
         await query.edit_message_caption(
@@ -147,20 +166,37 @@ def format_top_movers(df):
     """Format the top movers DataFrame into a readable MarkdownV2 string."""
     if df.empty:
         return "No top movers data available."
-    result = "**Top Movers Analysis:**\n\n"
-    for index, row in df.iterrows():
-        result += f"**Stock: {row['symbol']}**\n"
-        result += f"- Last Trade Price: ${row['last_trade_price']:.2f}\n"
-        result += f"- Short MA: ${row['ma_short']:.2f}\n"
-        result += f"- Long MA: ${row['ma_long']:.2f}\n"
-        result += f"- RSI: {row['rsi']:.2f}\n"
-        result += f"- Basic MA RSI Criteria: {'Yes' if row['basic_ma_rsi_criteria'] else 'No'}\n"
-        result += f"- Bullish MACD: {'Yes' if row['bullish_macd'] else 'No'}\n"
-        result += f"- Bollinger Bounce: {'Yes' if row['bollinger_bounce'] else 'No'}\n"
-        result += f"- Volume Spike: {'Yes' if row['volume_spike'] else 'No'}\n"
-        result += f"- Bullish Engulfing: {'Yes' if row['bullish_engulfing'] else 'No'}\n"
-        result += f"- Bullish Hammer: {'Yes' if row['bullish_hammer'] else 'No'}\n\n"
-    return result
+    def price(col):
+        return df[col].map(_F2)
+
+    def yes_no(col):
+        # Signals skipped by the screen are None
+        return df[col].map(YES_NO).fillna("Not checked")
+
+    # Build every row's text with column-wise string ops instead of a Python loop
+    rows = (
+        "**Stock: " + df['symbol'] + "**\n"
+        + "- Last Trade Price: $" + price('last_trade_price') + "\n"
+        + "- Short MA: $" + price('ma_short') + "\n"
+        + "- Long MA: $" + price('ma_long') + "\n"
+        + "- RSI: " + price('rsi') + "\n"
+        + "- Basic MA RSI Criteria: " + yes_no('basic_ma_rsi_criteria') + "\n"
+        + "- Bullish MACD: " + yes_no('bullish_macd') + "\n"
+        + "- Bollinger Bounce: " + yes_no('bollinger_bounce') + "\n"
+        + "- Volume Spike: " + yes_no('volume_spike') + "\n"
+        + "- Bullish Engulfing: " + yes_no('bullish_engulfing') + "\n"
+        + "- Bullish Hammer: " + yes_no('bullish_hammer') + "\n\n"
+    )
+    return "**Top Movers Analysis:**\n\n" + "".join(rows.tolist())
+
+async def _drain(stream, queue: asyncio.Queue):
+    """Feed every chunk of an async stream into the queue, then a None sentinel."""
+    try:
+        async for chunk in stream:
+            if chunk:
+                await queue.put(chunk)
+    finally:
+        await queue.put(None)
 
 async def company_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle company input with real-time streaming and message splitting."""
@@ -168,12 +204,22 @@ async def company_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     selected_feature = context.user_data.get('selected_feature')
     logger.info(f"Received company input: {company} for feature: {selected_feature}")
     message = await update.message.reply_text("Processing")
-    accumulated_content = ""
+    loop = asyncio.get_running_loop()
+    buf = []  # streamed chunks, joined only when an edit is sent
+    total_len = 0
     current_message = message
-    last_edit_time = 0
+    last_edit_time = loop.time()
+    sent_len = 0  # length of the text last sent to Telegram
+    pending_nonws = False  # unsent text includes more than whitespace
     TELEGRAM_MAX_LENGTH = 4096
+    MIN_EDIT_DELTA = 80  # minimum new characters before a timed edit
+    EDIT_INTERVAL = 0.75  # seconds between timed edits
+    EDIT_MIN_CHARS = 512  # new characters that trigger an edit regardless of time
 
     try:
+        if not await ensure_logged_in():
+            await message.edit_text(LOGIN_FAILED_MESSAGE)
+            return SELECTING_ACTION
         # Select the appropriate analysis stream
         if selected_feature == CALLBACK_ONE_YEAR_ANALYSIS:
             analysis_stream = gpt_stock_analysis(update)
@@ -183,35 +229,64 @@ async def company_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             analysis_stream = None
 
         if analysis_stream:
-            async for chunk in analysis_stream:
-                if chunk:
-                    # Add chunk to accumulated content
-                    temp_content = accumulated_content + chunk                    
-
-                    accumulated_content = temp_content
+            # GPT chunks are drained into a queue by a separate task, so a slow
+            # Telegram edit never holds up reading the stream
+            queue = asyncio.Queue()
+            producer = asyncio.create_task(_drain(analysis_stream, queue))
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(queue.get(), timeout=1.0)
+                        stalled = False
+                    except asyncio.TimeoutError:
+                        chunk, stalled = "", True  # nothing new for a second, flush what we have
+                    if chunk is None:
+                        break
+                    buf.append(chunk)
+                    total_len += len(chunk)
+                    if chunk.strip():
+                        pending_nonws = True
 
-                    # Update message periodically (every 1 second)
-                    current_time = time.time()
-                    if current_time - last_edit_time >= 1:
+                    # Update message periodically (every EDIT_INTERVAL, once enough new text
+                    # has arrived), as soon as EDIT_MIN_CHARS new characters are pending,
+                    # right away at a paragraph break, or when the stream stalls
+                    current_time = loop.time()
+                    unsent = total_len - sent_len
+                    timed = current_time - last_edit_time >= EDIT_INTERVAL and unsent >= MIN_EDIT_DELTA
+                    # Oversized text is left for the final split, whitespace-only growth isn't worth an edit
+                    if pending_nonws and total_len <= TELEGRAM_MAX_LENGTH \
+                            and (timed or unsent >= EDIT_MIN_CHARS or stalled or chunk.endswith('\n\n')):
                         try:
-                            await current_message.edit_text(accumulated_content)
+                            await current_message.edit_text("".join(buf))
                             last_edit_time = current_time
+                            sent_len = total_len
+                            pending_nonws = False
                         except BadRequest as e:
                             if "Message is not modified" in str(e):
                                 pass  # Ignore if content hasn't changed
                             else:
                                 raise
+                await producer  # re-raise any error from the stream
+            finally:
+                producer.cancel()
 
             # Send remaining content if any
+            accumulated_content = "".join(buf)
             if accumulated_content:
-                if len(accumulated_content) < TELEGRAM_MAX_LENGTH:
-                    await current_message.edit_text(accumulated_content)
+                if len(accumulated_content) <= TELEGRAM_MAX_LENGTH:
+                    if total_len != sent_len:
+                        await current_message.edit_text(accumulated_content)
                 else:
                     # Split remaining content into multiple messages
-                    while accumulated_content:
-                        await current_message.edit_text(accumulated_content[:TELEGRAM_MAX_LENGTH])
-                        accumulated_content = accumulated_content[TELEGRAM_MAX_LENGTH:]
-                        if accumulated_content:
+                    chunks = [
+                        accumulated_content[i:i + TELEGRAM_MAX_LENGTH]
+                        for i in range(0, len(accumulated_content), TELEGRAM_MAX_LENGTH)
+                    ]
+                    for i, piece in enumerate(chunks):
+                        # The first piece may already be on screen from a full-length streaming edit
+                        if i > 0 or sent_len != TELEGRAM_MAX_LENGTH:
+                            await current_message.edit_text(piece)
+                        if i + 1 < len(chunks):
                             current_message = await context.bot.send_message(
                                 chat_id=update.effective_chat.id,
                                 text="Continuing analysis"
@@ -223,20 +298,43 @@ async def company_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         await send_main_menu(update, context)
         return SELECTING_ACTION
 
+# Callback data -> handler, looked up once per button press
+FEATURE_HANDLERS = {
+    CALLBACK_START_MENU: show_main_menu,
+    CALLBACK_ONE_YEAR_ANALYSIS: partial(handle_feature_selection, feature=CALLBACK_ONE_YEAR_ANALYSIS),
+    CALLBACK_BULLISH_CHECK: partial(handle_feature_selection, feature=CALLBACK_BULLISH_CHECK),
+    CALLBACK_TOP_MOVERS: analyze_top_movers_handler,
+}
+
+async def dispatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route a button press to its handler based on the callback data."""
+    handler = FEATURE_HANDLERS.get(update.callback_query.data)
+    if handler is None:
+        logger.warning(f"Unknown callback data: {update.callback_query.data}")
+        await update.callback_query.answer()
+        return None  # stay in the current state
+    return await handler(update, context)
+
+async def on_startup(application: Application) -> None:
+    """Log into Robinhood off the event loop once the application is initialized."""
+    if not await ensure_logged_in():
+        logger.warning("Robinhood login failed at startup, retrying on first request")
+
 def main() -> None:
     """Run the bot."""
-    login_to_robinhood(os.getenv("ROBINHOOD_USER"), os.getenv("ROBINHOOD_PASS"), mfa=True)
+    try:
+        import uvloop  # faster event loop where available (not on Windows)
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     token = os.getenv("STONK_BOT_ID")
-    application = Application.builder().token(token).build()
+    application = Application.builder().token(token).post_init(on_startup).build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', start)],
         states={
             SELECTING_ACTION: [
-                CallbackQueryHandler(show_main_menu, pattern=f'^{CALLBACK_START_MENU}$'),
-                CallbackQueryHandler(one_year_analysis, pattern=f'^{CALLBACK_ONE_YEAR_ANALYSIS}$'),
-                CallbackQueryHandler(bullish_check, pattern=f'^{CALLBACK_BULLISH_CHECK}$'),
-                CallbackQueryHandler(analyze_top_movers_handler, pattern=f'^{CALLBACK_TOP_MOVERS}$'),
+                CallbackQueryHandler(dispatch),
             ],
             WAITING_FOR_COMPANY: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, company_input)
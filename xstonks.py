@@ -17,12 +17,44 @@ import pandas as pd
 import numpy as np
 import datetime
 import time
+import asyncio
 import os
+import re
 import pyotp
-import json
+import orjson
+import logging
+from pathlib import Path
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from robin_stocks.robinhood.globals import SESSION
+try:
+    from numba import njit, types
+except ImportError:  # numba is optional, the pandas implementations are used without it
+    njit = None
+try:
+    import pyarrow  # noqa: F401  (parquet engine for the on-disk historicals cache)
+except ImportError:  # without it the historicals are always fetched in full
+    pyarrow = None
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Keep a larger pool of keep-alive connections on the session robin_stocks uses for every request,
+# and retry idempotent requests that hit a dropped connection, rate limiting or a server error
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False),
+))
+
+def _orjson_response(response, *args, **kwargs):
+    """Session response hook: decode the body with orjson when robin_stocks calls response.json()."""
+    response.json = lambda **_: orjson.loads(response.content)
+    return response
+
+SESSION.hooks["response"].append(_orjson_response)
+
 
 # @TODO
 # Generate daily report of top movers and analysis results
@@ -30,10 +62,15 @@ load_dotenv()
 # Hook into Telegram bot, and receive analysis.
 
 # -------------------- Authentication --------------------
+# Expiry (epoch seconds) of the current Robinhood session; refreshed by ensure_logged_in
+_login_expires = 0.0
+_login_lock = asyncio.Lock()
+
 def login_to_robinhood(username, password, mfa=False):
     """
     Log into Robinhood.
     """
+    global _login_expires
 
     try:
         if mfa:
@@ -45,19 +82,84 @@ def login_to_robinhood(username, password, mfa=False):
             login = r.login(username, password)
 
         print("Successfully logged in.")
+        _login_expires = time.time() + float(login.get("expires_in", 86400))
         return login
     except Exception as e:
         print(f"Login failed: {e}")
-        print(str(login))
         return None
 
+async def ensure_logged_in(mfa=True):
+    """
+    Log into Robinhood with the ROBINHOOD_USER / ROBINHOOD_PASS credentials,
+    reusing the current session until a minute before it expires.
+    Returns True if a valid session is available.
+    """
+    if time.time() < _login_expires - 60:
+        return True
+    async with _login_lock:
+        if time.time() < _login_expires - 60:
+            return True
+        login = await asyncio.to_thread(login_to_robinhood, os.getenv("ROBINHOOD_USER"), os.getenv("ROBINHOOD_PASS"), mfa)
+        return login is not None
+
 # -------------------- Data Retrieval Functions --------------------
+# Price/volume columns returned as strings by the historicals API
+NUMERIC_COLUMNS = ['close_price', 'open_price', 'high_price', 'low_price', 'volume']
+# close_price feeds the MA, RSI, MACD and Bollinger math and stays float64 so those match
+# full precision; the other columns are only compared or averaged, and float32 is enough
+HISTORICALS_DTYPES = {**{col: np.float32 for col in NUMERIC_COLUMNS}, 'close_price': np.float64}
+
+def _with_historicals_dtypes(df):
+    """Cast the price/volume columns present in df to HISTORICALS_DTYPES."""
+    return df.astype({col: dtype for col, dtype in HISTORICALS_DTYPES.items() if col in df.columns})
+
+def _historicals_frame(historicals):
+    """
+    Convert a list of historicals records to a DataFrame with parsed time and price columns.
+    """
+    # Convert the list of dictionaries to a DataFrame
+    df = pd.DataFrame(historicals)
+
+    # Convert time and price columns
+    # (the timestamps are ISO 8601 and repeat across symbols, so skip format inference and memoize)
+    df['begins_at'] = pd.to_datetime(df['begins_at'], format='ISO8601', cache=True)
+    return _with_historicals_dtypes(df)
+
+def _load_historicals(symbol, interval, span, bounds):
+    """
+    Fetch historical data for a symbol and convert it to a DataFrame sorted by 'begins_at'.
+    This blocks on the network and on pandas, so async callers run it in a worker thread.
+    Returns None if the API returned no data.
+    """
+    historicals = r.stocks.get_stock_historicals(symbol, interval=interval, span=span, bounds=bounds)
+    if not historicals:
+        return None
+    df = _historicals_frame(historicals)
+
+    # Sort the data by date in case it isn't already sorted.
+    df.sort_values("begins_at", inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+def _load_historicals_batch(symbols, interval, span, bounds):
+    """
+    Fetch historical data for several symbols in a single API request.
+    Returns a dictionary mapping each symbol to its DataFrame sorted by 'begins_at'.
+    """
+    historicals = r.stocks.get_stock_historicals(symbols, interval=interval, span=span, bounds=bounds)
+    if not historicals:
+        return {}
+    # Convert the combined records once, then split them up by symbol
+    df = _historicals_frame(historicals)
+    df.sort_values(["symbol", "begins_at"], inplace=True)
+    return {symbol: group.reset_index(drop=True) for symbol, group in df.groupby("symbol", sort=False)}
+
 async def get_quote(symbol):
     """
     Retrieve real-time quote data for a given symbol.
     """
     try:
-        quote = r.stocks.get_stock_quote_by_symbol(symbol)
+        quote = await asyncio.to_thread(r.stocks.get_stock_quote_by_symbol, symbol)
         return quote
     except Exception as e:
         print(f"Error getting quote for {symbol}: {e}")
@@ -69,38 +171,104 @@ async def get_historicals(symbol, interval="5minute", span="day", bounds="regula
     Returns a pandas DataFrame.
     """
     try:
-        historicals = await r.stocks.get_stock_historicals(symbol, interval=interval, span=span, bounds=bounds)
-        df = pd.DataFrame(historicals)
-        if df.empty:
+        df = await asyncio.to_thread(_load_historicals, symbol, interval, span, bounds)
+        if df is None:
             print(f"No historical data for {symbol}.")
-            return None
-        # Convert time and price columns
-        df['begins_at'] = pd.to_datetime(df['begins_at'])
-        df['close_price'] = df['close_price'].astype(float)
-        if 'open_price' in df.columns:
-            df['open_price'] = df['open_price'].astype(float)
-        if 'high_price' in df.columns:
-            df['high_price'] = df['high_price'].astype(float)
-        if 'low_price' in df.columns:
-            df['low_price'] = df['low_price'].astype(float)
-        if 'volume' in df.columns:
-            df['volume'] = df['volume'].astype(float)
         return df
     except Exception as e:
         print(f"Error getting historical data for {symbol}: {e}")
         return None
+
+async def get_historicals_batch(symbols, interval="5minute", span="day", bounds="regular"):
+    """
+    Retrieve historical price data for a list of symbols with one API request.
+    Returns a dictionary mapping symbol to DataFrame; symbols without data are left out.
+    """
+    try:
+        return await asyncio.to_thread(_load_historicals_batch, list(symbols), interval, span, bounds)
+    except Exception as e:
+        print(f"Error getting historical data for {symbols}: {e}")
+        return {}
     
 # -------------------- Technical Indicator Functions --------------------
-async def compute_moving_average(prices, period):
+def _sma_cumsum(a, period):
+    """
+    Simple moving average of an array from the difference of its running sums, O(n) for any period.
+    The first 'period - 1' values are NaN, like rolling().mean(). Returns None if 'a' contains NaN,
+    which would otherwise spread through every later sum.
     """
-    Calculate the simple moving average (SMA) for a series of prices.
+    c = np.empty(a.size + 1)
+    c[0] = 0.0
+    np.cumsum(a, dtype=np.float64, out=c[1:])
+    if np.isnan(c[-1]):
+        return None
+    out = np.full(a.size, np.nan)
+    out[period - 1:] = (c[period:] - c[:-period]) / period
+    return out
+
+async def compute_moving_average(prices, period):
     """
-    return prices.rolling(window=period).mean()
+    Calculate the simple moving average (SMA) for an array of prices.
+    Takes and returns a numpy array, so no pandas objects are built per call.
+    """
+    sma = _sma_cumsum(prices, period)
+    if sma is None:
+        # NaN in the prices: let pandas' rolling window skip over them
+        sma = pd.Series(prices).rolling(window=period).mean().to_numpy()
+    return sma
+
+def _kernel_input(prices):
+    """
+    Price array to pass to the numba kernels. They are compiled ahead of time for both
+    float32 (the historicals' dtype) and float64 input, so only other dtypes are converted.
+    """
+    values = prices.to_numpy()
+    if values.dtype != np.float32:
+        values = values.astype(np.float64, copy=False)
+    return values
+
+if njit is not None:
+    # Input arrays the kernels are compiled for: float32 or float64, typed read-only so they
+    # accept both writable arrays and the read-only views pandas hands out under copy-on-write
+    _KERNEL_ARRAYS = [types.Array(dtype, 1, "A", readonly=True) for dtype in (types.float32, types.float64)]
+
+    @njit([types.float64[:](array, types.int64) for array in _KERNEL_ARRAYS], cache=True, error_model="numpy")
+    def _rsi_kernel(p, period):
+        """
+        Single-pass RSI over a price array, using the same simple moving averages of
+        gains and losses as the pandas version. The first 'period' values are NaN.
+        """
+        n = p.size
+        out = np.full(n, np.nan)
+        gain_sum = 0.0
+        loss_sum = 0.0
+        for i in range(1, n):
+            delta = p[i] - p[i - 1]
+            if delta > 0:
+                gain_sum += delta
+            else:
+                loss_sum -= delta
+            if i > period:
+                # Drop the change that just left the window
+                old = p[i - period] - p[i - period - 1]
+                if old > 0:
+                    gain_sum -= old
+                else:
+                    loss_sum += old
+            if i >= period:
+                out[i] = 100.0 - 100.0 / (1.0 + gain_sum / loss_sum)
+        return out
+else:
+    _rsi_kernel = None
 
 async def compute_rsi(prices, period=14):
     """
     Compute the Relative Strength Index (RSI) for a series of prices.
     """
+    if _rsi_kernel is not None:
+        values = _kernel_input(prices)
+        if not np.isnan(values).any():  # a NaN would poison the kernel's running sums
+            return pd.Series(_rsi_kernel(values, period), index=prices.index)
     delta = prices.diff()
     gain = delta.clip(lower=0)
     loss = -delta.clip(upper=0)
@@ -110,11 +278,43 @@ async def compute_rsi(prices, period=14):
     rsi = 100 - (100 / (1 + rs))
     return rsi
 
+if njit is not None:
+    @njit([types.UniTuple(types.float64[:], 3)(array, types.int64, types.int64, types.int64) for array in _KERNEL_ARRAYS],
+          cache=True)
+    def _macd_kernel(p, fast, slow, signal):
+        """
+        MACD line, signal line and histogram in one pass over a price array, using the
+        same recursive EMAs (seeded with the first value) as ewm(adjust=False).
+        """
+        n = p.size
+        macd = np.empty(n)
+        sig = np.empty(n)
+        hist = np.empty(n)
+        a_fast = 2.0 / (fast + 1)
+        a_slow = 2.0 / (slow + 1)
+        a_sig = 2.0 / (signal + 1)
+        ema_fast = ema_slow = p[0]
+        ema_sig = 0.0
+        for i in range(n):
+            ema_fast += a_fast * (p[i] - ema_fast)
+            ema_slow += a_slow * (p[i] - ema_slow)
+            macd[i] = ema_fast - ema_slow
+            ema_sig = macd[i] if i == 0 else ema_sig + a_sig * (macd[i] - ema_sig)
+            sig[i] = ema_sig
+            hist[i] = macd[i] - ema_sig
+        return macd, sig, hist
+else:
+    _macd_kernel = None
+
 async def compute_macd(prices, fast=12, slow=26, signal=9):
     """
     Compute MACD and its signal line using exponential moving averages.
     Returns: macd_line, signal_line, and MACD histogram.
     """
+    if _macd_kernel is not None and len(prices):
+        values = _kernel_input(prices)
+        if not np.isnan(values).any():  # ewm skips NaNs, the kernel doesn't
+            return tuple(pd.Series(out, index=prices.index) for out in _macd_kernel(values, fast, slow, signal))
     ema_fast = prices.ewm(span=fast, adjust=False).mean()
     ema_slow = prices.ewm(span=slow, adjust=False).mean()
     macd_line = ema_fast - ema_slow
@@ -127,34 +327,59 @@ async def compute_bollinger_bands(prices, period=20, num_std=2):
     Calculate Bollinger Bands for a series of prices.
     Returns: middle_band (SMA), upper_band, and lower_band.
     """
-    sma = prices.rolling(window=period).mean()
-    rolling_std = prices.rolling(window=period).std()
+    rolling = prices.rolling(window=period)
+    sma = rolling.mean()
+    rolling_std = rolling.std()
     upper_band = sma + num_std * rolling_std
     lower_band = sma - num_std * rolling_std
     return sma, upper_band, lower_band
 
+async def compute_all_indicators(df, short_period=50, long_period=200, rsi_period=14):
+    """
+    Compute the full set of indicators for the historical data summary from the 'close_price'
+    column: the 50/200 period moving averages by default, RSI, MACD and Bollinger Bands.
+    Returns a dictionary with the ma_short and ma_long arrays and the rsi, macd_line,
+    signal_line, macd_hist, bollinger_sma, upper_band and lower_band Series.
+    """
+    close = df['close_price']
+    close_arr = close.to_numpy()
+    macd_line, signal_line, macd_hist = await compute_macd(close)
+    bollinger_sma, upper_band, lower_band = await compute_bollinger_bands(close)
+    return {
+        "ma_short": await compute_moving_average(close_arr, short_period),
+        "ma_long": await compute_moving_average(close_arr, long_period),
+        "rsi": await compute_rsi(close, rsi_period),
+        "macd_line": macd_line,
+        "signal_line": signal_line,
+        "macd_hist": macd_hist,
+        "bollinger_sma": bollinger_sma,
+        "upper_band": upper_band,
+        "lower_band": lower_band,
+    }
+
 # -------------------- Additional Bullish Signal Functions --------------------
-async def check_bullish_macd(prices):
+async def check_bullish_macd(macd_line, signal_line):
     """
-    Check for a bullish MACD crossover.
+    Check for a bullish MACD crossover, given the MACD and signal lines.
     Returns True if the MACD line crosses above its signal line.
     """
-    macd_line, signal_line, _ = await compute_macd(prices)
     if len(macd_line) < 2:
         return False
-    if macd_line.iloc[-2] < signal_line.iloc[-2] and macd_line.iloc[-1] > signal_line.iloc[-1]:
+    # Read the last two values straight from the arrays rather than through .iloc
+    macd = macd_line.to_numpy()
+    signal = signal_line.to_numpy()
+    if macd[-2] < signal[-2] and macd[-1] > signal[-1]:
         return True
     return False
 
-async def check_bollinger_bounce(df, period=20, num_std=2):
+async def check_bollinger_bounce(df, sma, lower_band):
     """
-    Check if the price is bouncing off the lower Bollinger Band.
+    Check if the price is bouncing off the lower Bollinger Band, given the band's SMA and lower band.
     Returns True if the latest price is near the lower band and above the SMA.
     """
-    sma, upper_band, lower_band = await compute_bollinger_bands(df['close_price'], period, num_std)
-    latest_price = df['close_price'].iloc[-1]
+    latest_price = df['close_price'].to_numpy()[-1]
     # Consider it a bounce if price is within ~1% of the lower band and above the SMA.
-    if latest_price <= lower_band.iloc[-1] * 1.01 and latest_price > sma.iloc[-1]:
+    if latest_price <= lower_band.to_numpy()[-1] * 1.01 and latest_price > sma.to_numpy()[-1]:
         return True
     return False
 
@@ -165,12 +390,39 @@ async def check_volume_spike(df, multiplier=1.5):
     """
     if 'volume' not in df.columns:
         return False
-    avg_volume = df['volume'].rolling(window=20).mean().iloc[-1]
-    latest_volume = df['volume'].iloc[-1]
+    volume = df['volume'].to_numpy()
+    if volume.size < 20:
+        return False
+    # Only the latest 20-period average is needed, not the whole rolling series
+    avg_volume = volume[-20:].mean(dtype=np.float64)
+    latest_volume = volume[-1]
     if avg_volume > 0 and latest_volume >= multiplier * avg_volume:
         return True
     return False
 
+def _engulfing_mask(open_prices, close_prices):
+    """
+    Boolean array marking every candle that completes a bullish engulfing pattern with the one before it.
+    The first candle has no predecessor and is always False.
+    """
+    prev_open, curr_open = open_prices[:-1], open_prices[1:]
+    prev_close, curr_close = close_prices[:-1], close_prices[1:]
+    mask = np.zeros(open_prices.size, dtype=bool)
+    # Previous candle bearish and current candle bullish, with current body engulfing previous.
+    mask[1:] = (prev_close < prev_open) & (curr_close > curr_open) & (curr_open < prev_close) & (curr_close > prev_open)
+    return mask
+
+def _hammer_mask(open_prices, close_prices, high_prices, low_prices):
+    """
+    Boolean array marking every candle shaped like a bullish hammer.
+    """
+    body = np.abs(close_prices - open_prices)
+    candle_range = high_prices - low_prices
+    lower_shadow = np.minimum(open_prices, close_prices) - low_prices
+    # A hammer typically has a small body (less than 30% of the candle range) and a lower shadow at least 2x the body.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (candle_range != 0) & (body != 0) & (body / candle_range < 0.3) & (lower_shadow / body > 2)
+
 async def detect_bullish_engulfing(df):
     """
     Detect a bullish engulfing pattern using the last two candlesticks.
@@ -179,13 +431,10 @@ async def detect_bullish_engulfing(df):
     """
     if len(df) < 2 or 'open_price' not in df.columns or 'close_price' not in df.columns:
         return False
-    prev = df.iloc[-2]
-    curr = df.iloc[-1]
-    # Previous candle bearish and current candle bullish, with current body engulfing previous.
-    if prev['close_price'] < prev['open_price'] and curr['close_price'] > curr['open_price']:
-        if curr['open_price'] < prev['close_price'] and curr['close_price'] > prev['open_price']:
-            return True
-    return False
+    open_prices = df['open_price'].to_numpy()[-2:]
+    # Compare at one precision, so equal prices stored as float32 and float64 stay equal
+    close_prices = df['close_price'].to_numpy()[-2:].astype(open_prices.dtype)
+    return bool(_engulfing_mask(open_prices, close_prices)[-1])
 
 async def detect_bullish_hammer(df):
     """
@@ -195,20 +444,10 @@ async def detect_bullish_hammer(df):
     """
     if len(df) < 1 or not all(col in df.columns for col in ['open_price', 'close_price', 'high_price', 'low_price']):
         return False
-    latest = df.iloc[-1]
-    open_price = latest['open_price']
-    close_price = latest['close_price']
-    high_price = latest['high_price']
-    low_price = latest['low_price']
-    body = abs(close_price - open_price)
-    candle_range = high_price - low_price
-    lower_shadow = min(open_price, close_price) - low_price
-    if candle_range == 0 or body == 0:
-        return False
-    # A hammer typically has a small body (less than 30% of the candle range) and a lower shadow at least 2x the body.
-    if (body / candle_range < 0.3) and (lower_shadow / body > 2):
-        return True
-    return False
+    # Compare at one precision, so equal prices stored as float32 and float64 stay equal
+    dtype = df['open_price'].dtype
+    latest = [df[col].to_numpy()[-1:].astype(dtype) for col in ['open_price', 'close_price', 'high_price', 'low_price']]
+    return bool(_hammer_mask(*latest)[-1])
 
 """
 uses get_stock_historocals from robin_stocks to get the historical data for a stock ticker. Args below
@@ -219,6 +458,14 @@ uses get_stock_historocals from robin_stocks to get the historical data for a st
     info (Optional[str]) – Will filter the results to have a list of the values that correspond to key that matches info.
 """
 
+# Cached historicals, keyed by (symbol, interval, span, bounds) -> (expires_at, DataFrame)
+_historicals_cache = {}
+_historicals_locks = {}
+
+def _historicals_ttl(span):
+    """Seconds a cached historicals DataFrame stays fresh: 1 hour for yearly spans, 5 minutes otherwise."""
+    return 3600 if span in ("year", "5year") else 300
+
 async def generate_historical_dataframes(symbol, interval="day", span="year", bounds="regular"):
     """
     For each symbol in the provided list, retrieves historical data using the Robinhood API,
@@ -233,38 +480,133 @@ async def generate_historical_dataframes(symbol, interval="day", span="year", bo
     Returns:
       dict: A dictionary where the keys are symbols and the values are DataFrames containing
             historical data with at least a 'close_price' column.
-    """
-    dataframes = {}
-    
+
+    Results are cached per (symbol, interval, span, bounds) for a short TTL, so callers
+    must not modify the returned DataFrame in place.
+    """
+    key = (symbol.upper(), interval, span, bounds)
+    lock = _historicals_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _historicals_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        df = await _fetch_historical_dataframe(symbol, interval, span, bounds)
+        if df is not None and not df.empty:
+            _prune_historicals_cache()
+            _historicals_cache[key] = (time.monotonic() + _historicals_ttl(span), df)
+        return df
+
+def _prune_historicals_cache():
+    """
+    Drop expired cache entries, together with their lock when it isn't held, so neither
+    grows for the life of the process. Locks of keys without an entry (e.g. a fetch still
+    in flight or queued) are left alone.
+    """
+    now = time.monotonic()
+    for key in [key for key, (expires_at, _) in _historicals_cache.items() if expires_at <= now]:
+        del _historicals_cache[key]
+        lock = _historicals_locks.get(key)
+        if lock is not None and not lock.locked():
+            del _historicals_locks[key]
+
+# On-disk cache of daily historicals, refreshed with only the latest week of bars
+HISTORICALS_CACHE_DIR = Path(os.getenv("XSTONKS_CACHE_DIR", Path.home() / ".cache" / "xstonks"))
+# Spans that can be cached on disk, and how many years of bars each keeps
+_DISK_CACHE_SPAN_YEARS = {"year": 1, "5year": 5}
+# A cached file whose newest bar is older than this can't be topped up from a week of data
+_DISK_CACHE_MAX_AGE = pd.Timedelta(days=5)
+# Seconds after which the whole span is fetched again, even if the file is kept topped up
+_DISK_CACHE_FULL_REFRESH = 7 * 24 * 3600
+# Symbols safe to use in a cache file name (they come from user input)
+_CACHEABLE_SYMBOL_RE = re.compile(r"[A-Z0-9.\-]{1,10}")
+_PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price']
+
+def _history_adjusted(cached, recent):
+    """
+    True if bars present in both frames have different prices, e.g. after Robinhood
+    retroactively adjusted the history for a split or dividend. The newest bar of
+    'recent' may still be forming and is ignored.
+    """
+    cols = [col for col in _PRICE_COLUMNS if col in cached.columns and col in recent.columns]
+    overlap = recent.iloc[:-1][['begins_at'] + cols].merge(
+        cached[['begins_at'] + cols], on='begins_at', suffixes=('', '_cached')
+    )
+    return any(
+        not np.allclose(overlap[col].to_numpy(), overlap[f"{col}_cached"].to_numpy(), rtol=1e-5, equal_nan=True)
+        for col in cols
+    )
+
+def _load_historicals_cached(symbol, interval, span, bounds):
+    """
+    Load daily historicals through the parquet cache in HISTORICALS_CACHE_DIR.
+    A recent cache file is topped up with the last week of bars, and trimmed to the span.
+    The whole span is fetched instead when there is no usable file, when the week's bars
+    show the older history was adjusted, or once the last full fetch is a week old.
+    Falls back to _load_historicals when pyarrow is missing, for intraday data or symbols
+    that aren't plain tickers, and on any cache read/write error.
+    """
+    symbol = symbol.upper()
+    if (pyarrow is None or interval != "day" or span not in _DISK_CACHE_SPAN_YEARS
+            or not _CACHEABLE_SYMBOL_RE.fullmatch(symbol)):
+        return _load_historicals(symbol, interval, span, bounds)
+
+    path = HISTORICALS_CACHE_DIR / f"{symbol}_{interval}_{span}_{bounds}.parquet"
+    cached = None
+    full_fetch_at = None  # the file's mtime is kept at the time of its last full fetch
     try:
-        historicals = await r.stocks.get_stock_historicals(symbol, interval=interval, span=span, bounds=bounds)
-        # Convert the list of dictionaries to a DataFrame
-        df = pd.DataFrame(historicals)
-        if df.empty:
-            print(f"No historical data found for {symbol}.")
+        if path.exists():
+            full_fetch_at = path.stat().st_mtime
+            if time.time() - full_fetch_at < _DISK_CACHE_FULL_REFRESH:
+                cached = pd.read_parquet(path)
+                if cached['close_price'].dtype != HISTORICALS_DTYPES['close_price']:
+                    # Written at a lower close_price precision; upcasting can't restore it, so refetch
+                    cached = None
+                else:
+                    cached = _with_historicals_dtypes(cached)
+    except Exception:
+        logger.warning("Ignoring unreadable historicals cache %s", path, exc_info=True)
+
+    df = None
+    now = pd.Timestamp.now(tz="UTC")
+    if cached is not None and not cached.empty and cached['begins_at'].max() >= now - _DISK_CACHE_MAX_AGE:
+        recent = _load_historicals(symbol, interval, "week", bounds)
+        if recent is None:
+            return cached
+        if not _history_adjusted(cached, recent):
+            # Newer copies of a bar (e.g. today's, still forming) replace the cached ones
+            df = pd.concat([cached, recent], ignore_index=True)
+            df.drop_duplicates("begins_at", keep="last", inplace=True)
+            df.sort_values("begins_at", inplace=True)
+            df = df[df['begins_at'] > df['begins_at'].iloc[-1] - pd.DateOffset(years=_DISK_CACHE_SPAN_YEARS[span])]
+            df.reset_index(drop=True, inplace=True)
+    topped_up = df is not None
+    if not topped_up:
+        df = _load_historicals(symbol, interval, span, bounds)
+        if df is None:
+            return None
 
-        # Convert time and price columns
-        df['begins_at'] = pd.to_datetime(df['begins_at'])
-        df['close_price'] = df['close_price'].astype(float)
-        
-        # (Optional) Convert additional columns if needed
-        if 'open_price' in df.columns:
-            df['open_price'] = df['open_price'].astype(float)
-        if 'high_price' in df.columns:
-            df['high_price'] = df['high_price'].astype(float)
-        if 'low_price' in df.columns:
-            df['low_price'] = df['low_price'].astype(float)
-        if 'volume' in df.columns:
-            df['volume'] = df['volume'].astype(float)
-        
-        # Sort the data by date in case it isn't already sorted.
-        df.sort_values("begins_at", inplace=True)
-        df.reset_index(drop=True, inplace=True)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(path, index=False)
+        if topped_up:
+            # Keep the mtime at the last full fetch, so the periodic full refresh still happens
+            os.utime(path, (time.time(), full_fetch_at))
+    except Exception:
+        logger.warning("Could not write historicals cache %s", path, exc_info=True)
+    return df
 
+async def _fetch_historical_dataframe(symbol, interval, span, bounds):
+    """
+    Fetch historical data for a symbol from the Robinhood API and convert it to a DataFrame.
+    """
+    try:
+        df = await asyncio.to_thread(_load_historicals_cached, symbol, interval, span, bounds)
+        if df is None:
+            print(f"No historical data found for {symbol}.")
+        return df
     except Exception as e:
         print(f"Error retrieving data for {symbol}: {e}")
-    
-    return df
+        return None
 
 
     
@@ -314,41 +656,36 @@ async def golden_cross_detector(df, short_period=50, long_period=200, lookback=5
         print(f"Insufficient data: need at least {long_period} data points.")
         return False
 
-    # Create a copy of the DataFrame to avoid modifying the original data
-    df = df.copy()
-    
-    # Calculate moving averages for closing prices
-    df['ma_short'] = df['close_price'].rolling(window=short_period).mean()
-    df['ma_long'] = df['close_price'].rolling(window=long_period).mean()
+    # Calculate moving averages for closing prices as plain arrays (no copy of the DataFrame)
+    close = df['close_price'].to_numpy()
+    ma_short = await compute_moving_average(close, short_period)
+    ma_long = await compute_moving_average(close, long_period)
     
     # Get the latest (most recent) moving average values
-    latest = df.iloc[-1]
-    current_ma_short = latest['ma_short']
-    current_ma_long = latest['ma_long']
+    current_ma_short = ma_short[-1]
+    current_ma_long = ma_long[-1]
     
     # If the golden cross has already occurred, return False
     if current_ma_short >= current_ma_long:
         return False
 
-    # Drop rows with NaN values (which occur until enough data points are available)
-    df_clean = df.dropna(subset=['ma_short', 'ma_long'])
-    
+    # Only the points after the long MA's warm-up (where it is still NaN) are usable.
     # Ensure we have enough data points for the lookback period
-    if len(df_clean) < lookback:
+    if len(ma_long) - (long_period - 1) < lookback:
         print("Insufficient clean data in the lookback period.")
         return False
 
     # Extract the most recent 'lookback' period for analysis
-    recent_data = df_clean.tail(lookback)
+    recent_ma_short = ma_short[-lookback:]
+    recent_ma_long = ma_long[-lookback:]
     
     # Compute the slope (rate of change) of the short-term moving average over the lookback period.
-    recent_ma_short = recent_data['ma_short']
-    slope_short = (recent_ma_short.iloc[-1] - recent_ma_short.iloc[0]) / lookback
+    slope_short = (recent_ma_short[-1] - recent_ma_short[0]) / lookback
 
     # Compute the gap between long-term and short-term MAs over the lookback period.
-    recent_gap = recent_data['ma_long'] - recent_data['ma_short']
+    recent_gap = recent_ma_long - recent_ma_short
     # A negative slope in the gap indicates that the gap is narrowing.
-    gap_slope = (recent_gap.iloc[-1] - recent_gap.iloc[0]) / lookback
+    gap_slope = (recent_gap[-1] - recent_gap[0]) / lookback
     
     # Calculate the current gap ratio relative to the long-term MA.
     current_gap_ratio = (current_ma_long - current_ma_short) / current_ma_long
@@ -369,8 +706,52 @@ async def golden_cross_detector(df, short_period=50, long_period=200, lookback=5
         return False
 
 
+# -------------------- Historical Data Summary --------------------
+def _last_value(series):
+    """Return the latest value of a series or array as a float, or None if it is NaN."""
+    value = np.asarray(series)[-1]
+    return None if pd.isna(value) else round(float(value), 4)
+
+async def summarize_historicals(df, recent=20):
+    """
+    Condense a historical price DataFrame into a compact dictionary for the LLM.
+
+    Instead of every candle, the summary holds the price range of the whole span,
+    the latest SMA50/SMA200, RSI, MACD and Bollinger Band values, and the
+    'recent' most recent candles.
+    """
+    close = df['close_price']
+    indicators = await compute_all_indicators(df)
+
+    candle_cols = [col for col in ['open_price', 'high_price', 'low_price', 'close_price', 'volume'] if col in df.columns]
+    candles = df.tail(recent)[candle_cols].astype(float).round(2)
+    candles.insert(0, 'date', df['begins_at'].tail(recent).dt.strftime('%Y-%m-%d'))
+
+    return {
+        "start_date": df['begins_at'].iloc[0].strftime('%Y-%m-%d'),
+        "end_date": df['begins_at'].iloc[-1].strftime('%Y-%m-%d'),
+        "first_close": _last_value(close.head(1)),
+        "last_close": _last_value(close),
+        "high": round(float(df['high_price'].max() if 'high_price' in df.columns else close.max()), 2),
+        "low": round(float(df['low_price'].min() if 'low_price' in df.columns else close.min()), 2),
+        "sma50": _last_value(indicators["ma_short"]),
+        "sma200": _last_value(indicators["ma_long"]),
+        "rsi14": _last_value(indicators["rsi"]),
+        "macd": _last_value(indicators["macd_line"]),
+        "macd_signal": _last_value(indicators["signal_line"]),
+        "macd_hist": _last_value(indicators["macd_hist"]),
+        "bollinger_upper": _last_value(indicators["upper_band"]),
+        "bollinger_middle": _last_value(indicators["bollinger_sma"]),
+        "bollinger_lower": _last_value(indicators["lower_band"]),
+        "recent_candles": candles.to_dict("records"),
+    }
+
+
 # -------------------- Extended Stock Analysis --------------------
-async def bullish_stock_check_data(symbol):
+# Signals that are only evaluated for stocks passing the basic MA/RSI criteria when screening
+BULLISH_SIGNALS = ["bullish_macd", "bollinger_bounce", "volume_spike", "bullish_engulfing", "bullish_hammer"]
+
+async def bullish_stock_check_data(symbol, df=None, screen=False):
     """
     Analyze a stock and return a dictionary with the following fields:
       - symbol,
@@ -384,10 +765,23 @@ async def bullish_stock_check_data(symbol):
       - volume_spike: True if a volume spike is detected.
       - bullish_engulfing: True if a bullish engulfing pattern is detected.
       - bullish_hammer: True if a bullish hammer pattern is detected.
+
+    'df' may hold the symbol's already fetched 5 minute historicals for the day;
+    they are fetched here otherwise.
+
+    With 'screen' set, a stock failing the basic MA/RSI criteria is returned right away,
+    with the remaining signals set to None instead of being computed.
     """
     data = {"symbol": symbol}
     
-    quote = await get_quote(symbol)
+    if df is None:
+        # Fetch the quote and the historicals at the same time
+        quote, df = await asyncio.gather(
+            get_quote(symbol),
+            get_historicals(symbol, interval="5minute", span="day", bounds="regular"),
+        )
+    else:
+        quote = await get_quote(symbol)
     if quote is None:
         print(f"Missing quote data for {symbol}.")
         return None
@@ -398,27 +792,31 @@ async def bullish_stock_check_data(symbol):
         return None
     data["last_trade_price"] = last_trade_price
 
-    df = await get_historicals(symbol, interval="5minute", span="day", bounds="regular")
     if df is None or df.empty:
         print(f"Skipping {symbol} due to missing historical data.")
         return None
 
-    # Compute moving averages and RSI on closing prices.
-    df['ma_short'] = await compute_moving_average(df['close_price'], period=10)
-    df['ma_long'] = await compute_moving_average(df['close_price'], period=50)
-    df['rsi'] = await compute_rsi(df['close_price'], period=14)
-    latest = df.iloc[-1]
-    ma_short = latest['ma_short']
-    ma_long = latest['ma_long']
-    rsi = latest['rsi']
+    # Compute the cheap moving averages (MA10, MA50) and RSI on closing prices first.
+    close = df['close_price']
+    close_arr = close.to_numpy()
+    ma_short = float((await compute_moving_average(close_arr, 10))[-1])
+    ma_long = float((await compute_moving_average(close_arr, 50))[-1])
+    rsi = float((await compute_rsi(close, 14)).to_numpy()[-1])
     data["ma_short"] = ma_short
     data["ma_long"] = ma_long
     data["rsi"] = rsi
 
     # Basic criteria: Price above MA10, MA10 above MA50, RSI under 70.
     data["basic_ma_rsi_criteria"] = (last_trade_price > ma_short and ma_short > ma_long and rsi < 70)
-    data["bullish_macd"] = await check_bullish_macd(df['close_price'])
-    data["bollinger_bounce"] = await check_bollinger_bounce(df)
+    if screen and not data["basic_ma_rsi_criteria"]:
+        data.update(dict.fromkeys(BULLISH_SIGNALS))
+        return data
+
+    # Only then the MACD, Bollinger Bands and candle patterns.
+    macd_line, signal_line, _ = await compute_macd(close)
+    bollinger_sma, _, lower_band = await compute_bollinger_bands(close)
+    data["bullish_macd"] = await check_bullish_macd(macd_line, signal_line)
+    data["bollinger_bounce"] = await check_bollinger_bounce(df, bollinger_sma, lower_band)
     data["volume_spike"] = await check_volume_spike(df)
     data["bullish_engulfing"] = await detect_bullish_engulfing(df)
     data["bullish_hammer"] = await detect_bullish_hammer(df)
@@ -434,17 +832,19 @@ def get_watchlist_stocks(watchlist_name):
     """
     try:
         watchlists = r.account.get_all_watchlists()
-        #print(json.dumps(watchlists, indent=3))
-        for wl in watchlists["results"]:
-            # Adjust key names as needed; here we assume a 'display_name' field.
-            print(json.dumps(wl,indent=3))
-            if wl.get('display_name', '').lower() == watchlist_name.lower():
-                # Assume the watchlist has a 'symbols' key with a list of stock symbols.
-                symbols = wl.get('symbols', [])
-                print(f"Found watchlist '{watchlist_name}' with {len(symbols)} symbols.")
-                return symbols
-        print(f"Watchlist '{watchlist_name}' not found.")
-        return []
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Watchlists: %s", orjson.dumps(watchlists, option=orjson.OPT_INDENT_2).decode())
+        # Index the watchlists by lowercased name (reversed so the first of any duplicates wins).
+        # Adjust key names as needed; here we assume a 'display_name' field.
+        by_name = {wl.get('display_name', '').lower(): wl for wl in reversed(watchlists["results"])}
+        wl = by_name.get(watchlist_name.lower())
+        if wl is None:
+            print(f"Watchlist '{watchlist_name}' not found.")
+            return []
+        # Assume the watchlist has a 'symbols' key with a list of stock symbols.
+        symbols = wl.get('symbols', [])
+        print(f"Found watchlist '{watchlist_name}' with {len(symbols)} symbols.")
+        return symbols
     except Exception as e:
         print(f"Error retrieving watchlist '{watchlist_name}': {e}")
         return []
@@ -463,40 +863,41 @@ def get_top_movers(info=None):
             ticker = symbol["symbol"]
             print(f"Ticker - {ticker}")
             top_movers_symbols.append(ticker)
-            return top_movers_symbols
+        return top_movers_symbols
     except Exception as e:
         print(f"Error fetching top movers: {e}")
         return None
 
 
 # -------------------- Main Function --------------------
+# Maximum number of symbols analyzed at once, to stay clear of Robinhood's rate limits
+MAX_CONCURRENT_SYMBOLS = 8
+
 async def analyze_top_movers():
    
     # Retrieve the watchlist 'xstonks'
     #watchlist_name = "xstonks"
     #symbols = get_watchlist_stocks(watchlist_name)
-    print(json.dumps(get_top_movers(), indent=3))
-    top_movers_symbols = []
-    top_movers = get_top_movers()
-    for symbol in top_movers:
-        ticker = symbol["symbol"]
-        top_movers_symbols.append(ticker)
-    symbols = top_movers_symbols
+    symbols = await asyncio.to_thread(get_top_movers)
 
     # If no symbols are found, exit.
     if not symbols:
         print("No symbols. Exiting.")
         return
 
+    # Fetch the intraday historicals of every symbol in one request.
+    historicals = await get_historicals_batch(symbols, interval="5minute", span="day", bounds="regular")
+
+    # Analyze the symbols concurrently, a few at a time.
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SYMBOLS)
+
+    async def check_symbol(symbol):
+        async with semaphore:
+            print(f"\nProcessing {symbol}...")
+            return await bullish_stock_check_data(symbol, historicals.get(symbol), screen=True)
+
     # List to store results for each stock.
-    results = []
-    for symbol in symbols:
-        print(f"\nProcessing {symbol}...")
-        stock_data = await bullish_stock_check_data(symbol)
-        if stock_data:
-            results.append(stock_data)
-        # Optional: add a short sleep to avoid rate limiting.
-        time.sleep(0.5)
+    results = [stock_data for stock_data in await asyncio.gather(*(check_symbol(symbol) for symbol in symbols)) if stock_data]
 
     # Create a DataFrame from the results.
     if results: